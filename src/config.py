@@ -4,8 +4,33 @@ BUCKET: str = "rl-data"  # use "quicklink-public" for testing
 DOWNLOAD_PREFIX: str = "job-postings-raw"
 UPLOAD_PREFIX: str = "job-postings-mod"
 
+# read and write files in "s3" or in the "local" directory LOCAL_ROOT, where
+# each bucket is a subdirectory, e.g. LOCAL_ROOT/BUCKET/DOWNLOAD_PREFIX
+STORAGE_BACKEND: str = "s3"
+LOCAL_ROOT: str = "data"
+
 REDIS_HOST: str = "localhost"
 REDIS_PORT: int = 6379
 
 GRPC_HOST: str = "localhost"
 GRPC_PORT: int = 50051
+
+# number of processes used to parse large input files, 0 parses them on the
+# event loop
+PARSE_WORKERS: int = 0
+
+# normalize company and title before cache keying and inference, note that
+# changing these settings changes the cache keys, so enabling them on an
+# existing cache causes a burst of cache misses
+CANONICALIZE_KEYS: bool = False
+STRIP_COMPANY_SUFFIXES: bool = False  # e.g. "Acme Corp, Inc." -> "acme"
+
+# skip postings that are re-scraped within DEDUP_WINDOW seconds
+DEDUP_ENABLED: bool = False
+DEDUP_WINDOW: int = 600
+DEDUP_CAPACITY: int = 200_000  # postings per filter generation
+DEDUP_ERROR_RATE: float = 0.001
+DEDUP_POLICY: str = "drop"  # "drop" duplicates or "copy" the earlier result
+
+# profiles, traces and memory snapshots are written here, see profiling.py
+PROFILE_DIR: str = "profiles"
@@ -0,0 +1,149 @@
+"""Probabilistic sketches to deduplicate and count distinct job postings."""
+
+import math
+import time
+from enum import StrEnum
+
+from jobs import JobPosting
+
+
+class DedupPolicy(StrEnum):
+    """What to do with a posting that was already ingested recently."""
+
+    DROP = "drop"  # leave the duplicate out of the output file
+    COPY = "copy"  # reuse the earlier processed result in the output file
+
+
+class BloomFilter:
+    """Fixed-size Bloom filter over 64-bit integer keys."""
+
+    def __init__(self, *, capacity: int, error_rate: float) -> None:
+        # optimal number of bits and hash functions for the given capacity
+        # and false positive rate
+        self.num_bits: int = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.num_hashes: int = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count: int = 0
+
+    def _positions(self, key: int) -> list[int]:
+        # double hashing: derive every index from the two halves of the key
+        key &= 0xFFFFFFFFFFFFFFFF
+        h1 = key & 0xFFFFFFFF
+        h2 = (key >> 32) | 1  # odd step so all bits are reachable
+        return [(h1 + i * h2) % self.num_bits for i in range(self.num_hashes)]
+
+    def __contains__(self, key: int) -> bool:
+        """Checks whether the key may have been added to the filter.
+
+        Returns:
+            bool: False if the key was definitely never added.
+        """
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(key))
+
+    def add(self, key: int) -> None:
+        """Adds a key to the filter."""
+        for pos in self._positions(key):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+        self.count += 1
+
+
+class HyperLogLog:
+    """Estimates the number of distinct 64-bit integer keys in bounded memory.
+
+    Uses `2**precision` one-byte registers, with a relative standard error of
+    about `1.04 / sqrt(2**precision)` (0.8% for the default precision).
+    """
+
+    def __init__(self, precision: int = 14) -> None:
+        self.precision: int = precision
+        self.num_registers: int = 1 << precision
+        self.registers = bytearray(self.num_registers)
+
+    def add(self, key: int) -> None:
+        """Adds a key to the sketch."""
+        # python hashes are not uniform for small inputs (integers hash to
+        # themselves), so mix all 64 bits with the splitmix64 finalizer
+        key = (key + 0x9E3779B97F4A7C15) & 0xFFFFFFFFFFFFFFFF
+        key = ((key ^ (key >> 30)) * 0xBF58476D1CE4E5B9) & 0xFFFFFFFFFFFFFFFF
+        key = ((key ^ (key >> 27)) * 0x94D049BB133111EB) & 0xFFFFFFFFFFFFFFFF
+        key ^= key >> 31
+        index = key >> (64 - self.precision)
+        remaining = key & ((1 << (64 - self.precision)) - 1)
+        rank = 64 - self.precision - remaining.bit_length() + 1
+        self.registers[index] = max(self.registers[index], rank)
+
+    def count(self) -> int:
+        """Estimates the number of distinct keys added so far.
+
+        Returns:
+            int: The estimated count.
+        """
+        alpha = 0.7213 / (1 + 1.079 / self.num_registers)
+        estimate = alpha * self.num_registers**2 / sum(2.0**-rank for rank in self.registers)
+        zeros = self.registers.count(0)
+        if estimate <= 2.5 * self.num_registers and zeros:
+            # linear counting is more accurate for small cardinalities
+            estimate = self.num_registers * math.log(self.num_registers / zeros)
+        return round(estimate)
+
+
+class PostingDeduplicator:
+    """Detects postings already seen within a sliding time window.
+
+    Keeps two Bloom filter generations: new postings are added to the current
+    one and looked up in both. The current generation becomes the previous one
+    once it is older than `window` seconds or holds `capacity` postings, and
+    memory stays bounded at two filters. A repeat within `window` seconds of
+    the original is caught as long as fewer than `capacity` postings arrive in
+    between; under heavier traffic the filters rotate on capacity instead and
+    the effective window shrinks accordingly.
+    """
+
+    def __init__(
+        self,
+        *,
+        window: float,
+        capacity: int,
+        error_rate: float,
+        policy: DedupPolicy = DedupPolicy.DROP,
+    ) -> None:
+        self.window: float = window
+        self.capacity: int = capacity
+        self.error_rate: float = error_rate
+        self.policy: DedupPolicy = policy
+        self.current: BloomFilter = self._new_filter()
+        self.previous: BloomFilter = self._new_filter()
+        self.rotated_at: float = time.monotonic()
+        self.duplicates: int = 0
+
+    def _new_filter(self) -> BloomFilter:
+        return BloomFilter(capacity=self.capacity, error_rate=self.error_rate)
+
+    def _maybe_rotate(self) -> None:
+        now = time.monotonic()
+        if now - self.rotated_at >= self.window or self.current.count >= self.capacity:
+            self.previous = self.current
+            self.current = self._new_filter()
+            self.rotated_at = now
+
+    def is_duplicate(self, posting: JobPosting) -> bool:
+        """Checks whether a posting was seen recently and records it.
+
+        Uses the same fields as `JobPosting.__hash__`, so two postings are
+        duplicates exactly when their processed records would be identical.
+
+        Returns:
+            bool: True if the posting was (probably) seen within the window.
+        """
+        self._maybe_rotate()
+        key = hash(posting)
+        if key in self.current:
+            self.duplicates += 1
+            return True
+        if key in self.previous:
+            # carry the posting over so that it survives the next rotation
+            self.current.add(key)
+            self.duplicates += 1
+            return True
+        self.current.add(key)
+        return False
@@ -1,9 +1,44 @@
 """Dataclasses for job postings and processed job postings."""
 
+import re
+import unicodedata
+from functools import lru_cache
 from hashlib import sha256
 
 from pydantic import BaseModel
 
+from config import CANONICALIZE_KEYS, STRIP_COMPANY_SUFFIXES
+
+# legal entity suffixes that do not change which company a posting is from,
+# along with any separators ("," or "&") in front of them
+COMPANY_SUFFIX_PATTERN = re.compile(
+    r"(?:[\s,&]+(?:inc|incorporated|llc|l\.l\.c|ltd|limited|corp|corporation|co|plc|gmbh)\.?)+$"
+)
+# words that cannot name a company on their own, e.g. "the" in "The Limited"
+COMPANY_ARTICLES = frozenset({"the", "a", "an"})
+
+
+@lru_cache(maxsize=65536)
+def canonicalize(text: str, *, strip_company_suffixes: bool = False) -> str:
+    """Normalizes a company name or job title for cache keying.
+
+    Applies Unicode NFKC normalization, case folding and whitespace collapsing
+    so that trivially different spellings map to the same cache entry, and
+    optionally strips legal suffixes such as "Inc." or "LLC" from company
+    names.
+
+    Returns:
+        str: The canonical form of the text.
+    """
+    text = " ".join(unicodedata.normalize("NFKC", text).casefold().split())
+    if strip_company_suffixes:
+        name = COMPANY_SUFFIX_PATTERN.sub("", text).rstrip(" ,&")
+        # only strip the suffix if a name is left, so that "the limited" does
+        # not collide with every other company that reduces to "the"
+        if name and name not in COMPANY_ARTICLES:
+            text = name
+    return text
+
 
 class JobPosting(BaseModel):
     """Dataclass representing a raw job posting record."""
@@ -26,10 +61,29 @@ class JobPosting(BaseModel):
         # when we add seniority
         return hash((self.url, self.company, self.title, self.location, self.scraped_on))
 
+    @property
+    def canonical_company(self) -> str:
+        """Company name used for cache keying and inference."""
+        if not CANONICALIZE_KEYS:
+            return self.company
+        return canonicalize(self.company, strip_company_suffixes=STRIP_COMPANY_SUFFIXES)
+
+    @property
+    def canonical_title(self) -> str:
+        """Job title used for cache keying and inference."""
+        if not CANONICALIZE_KEYS:
+            return self.title
+        return canonicalize(self.title)
+
     @property
     def cache_key(self) -> str:
-        """Generates a Redis cache key based on the company and title."""
-        return sha256(f"{self.company}\t{self.title}".encode()).hexdigest()
+        """Generates a Redis cache key based on the company and title.
+
+        The canonical company and title are used so that trivially different
+        spellings share the same cache entry, while the original values are
+        kept in the posting itself.
+        """
+        return sha256(f"{self.canonical_company}\t{self.canonical_title}".encode()).hexdigest()
 
     @property
     def uuid(self) -> int:
@@ -0,0 +1,199 @@
+"""Runtime toggleable profiling and tracing for the pipeline.
+
+Send `SIGUSR1` to the client to start profiling and tracing, and send it again
+to stop and write the results to `PROFILE_DIR`: a `cProfile` dump of the event
+loop thread and a Chrome trace (viewable in Perfetto or `chrome://tracing`) of
+the spans recorded for each pipeline stage. Send `SIGUSR2` to write a
+`tracemalloc` snapshot, the first one starts tracking allocations.
+"""
+
+import asyncio
+import contextlib
+import cProfile
+import json
+import os
+import signal
+import threading
+import time
+import tracemalloc
+from collections.abc import Callable
+from pathlib import Path
+from types import TracebackType
+from typing import Any
+
+MAX_TRACE_EVENTS: int = 1_000_000  # stop recording spans beyond this
+
+
+class Span:
+    """Context manager that records a single complete trace event."""
+
+    __slots__ = ("args", "name", "start", "tracer")
+
+    def __init__(self, tracer: "Tracer", name: str, args: dict[str, Any]) -> None:
+        self.tracer = tracer
+        self.name = name
+        self.args = args
+        self.start: int = 0
+
+    def __enter__(self) -> "Span":
+        """Starts timing the span.
+
+        Returns:
+            Span: The span itself.
+        """
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc_value: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        """Records the span, also when the body raised an exception."""
+        self.tracer.record(self.name, self.start, time.perf_counter_ns(), self.args)
+
+
+class Tracer:
+    """Records per-stage spans in the Chrome trace event format.
+
+    Spans are only recorded while the tracer is enabled; otherwise `span`
+    returns a shared no-op context manager, so instrumented code pays for
+    little more than an attribute lookup.
+    """
+
+    def __init__(self) -> None:
+        self.enabled: bool = False
+        self.events: list[dict[str, Any]] = []
+        self.tracks: dict[str, int] = {}
+        self._null_span = contextlib.nullcontext()
+
+    def span(self, name: str, **args: Any) -> contextlib.AbstractContextManager:  # noqa: ANN401
+        """Creates a span covering the body of a `with` statement.
+
+        Returns:
+            contextlib.AbstractContextManager: The span context manager.
+        """
+        if not self.enabled:
+            return self._null_span
+        return Span(self, name, args)
+
+    def record(self, name: str, start_ns: int, end_ns: int, args: dict[str, Any]) -> None:
+        """Records a complete event, attributed to the current asyncio task."""
+        if len(self.events) >= MAX_TRACE_EVENTS:
+            return
+        try:
+            task = asyncio.current_task()
+        except RuntimeError:
+            task = None
+        # concurrent tasks are shown as separate named tracks in the viewer
+        track = task.get_name() if task is not None else threading.current_thread().name
+        if track not in self.tracks:
+            self.tracks[track] = len(self.tracks) + 1
+            self.events.append({
+                "name": "thread_name",
+                "ph": "M",
+                "pid": os.getpid(),
+                "tid": self.tracks[track],
+                "args": {"name": track},
+            })
+        self.events.append({
+            "name": name,
+            "ph": "X",
+            "ts": start_ns / 1000,
+            "dur": (end_ns - start_ns) / 1000,
+            "pid": os.getpid(),
+            "tid": self.tracks[track],
+            "args": args,
+        })
+
+    def take_events(self) -> list[dict[str, Any]]:
+        """Returns the recorded events and starts a new trace.
+
+        Returns:
+            list[dict[str, Any]]: The recorded trace events.
+        """
+        events = self.events
+        self.events = []
+        self.tracks = {}
+        return events
+
+    @staticmethod
+    def dump(events: list[dict[str, Any]], path: Path) -> None:
+        """Writes trace events to a JSON file."""
+        with path.open("w") as file:
+            json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+
+
+TRACER = Tracer()
+
+
+class Profiler:
+    """Toggles `cProfile`, span tracing and `tracemalloc` snapshots."""
+
+    def __init__(self, output_dir: Path | str, tracer: Tracer = TRACER) -> None:
+        self.output_dir: Path = Path(output_dir)
+        self.tracer: Tracer = tracer
+        self.profile: cProfile.Profile | None = None
+        self.dump_tasks: set[asyncio.Task] = set()
+
+    def toggle(self) -> None:
+        """Starts profiling and tracing, or stops them and saves the results."""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        if self.profile is None:
+            print("Starting profiling and tracing")
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+            self.tracer.enabled = True
+            return
+
+        profile = self.profile
+        profile.disable()
+        self.tracer.enabled = False
+        self.profile = None
+        events = self.tracer.take_events()
+        timestamp = int(time.time())
+        profile_path = self.output_dir / f"{timestamp}.prof"
+        trace_path = self.output_dir / f"{timestamp}.trace.json"
+        print("Stopped profiling and tracing, writing results")
+
+        def write_results() -> None:
+            profile.dump_stats(profile_path)
+            self.tracer.dump(events, trace_path)
+            print(f"Wrote {profile_path} and {trace_path}")
+
+        self._run_in_background(write_results)
+
+    def _run_in_background(self, func: Callable[[], None]) -> None:
+        # writing up to MAX_TRACE_EVENTS events or a large snapshot takes a
+        # while, so do it in a thread to keep the event loop running
+        task = asyncio.create_task(asyncio.to_thread(func))
+        # create a reference to task to avoid garbage collection
+        self.dump_tasks.add(task)
+        task.add_done_callback(self.dump_tasks.discard)
+
+    def snapshot_memory(self) -> None:
+        """Starts tracking allocations, or writes a `tracemalloc` snapshot."""
+        if not tracemalloc.is_tracing():
+            print("Started tracking memory allocations, snapshots will follow")
+            tracemalloc.start()
+            return
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        snapshot_path = self.output_dir / f"{int(time.time())}.tracemalloc"
+        snapshot = tracemalloc.take_snapshot()
+
+        def write_snapshot() -> None:
+            snapshot.dump(str(snapshot_path))
+            print(f"Wrote memory snapshot {snapshot_path}")
+
+        self._run_in_background(write_snapshot)
+
+    def install_signal_handlers(self) -> None:
+        """Toggles profiling on `SIGUSR1` and snapshots memory on `SIGUSR2`."""
+        loop = asyncio.get_running_loop()
+        try:
+            loop.add_signal_handler(signal.SIGUSR1, self.toggle)
+            loop.add_signal_handler(signal.SIGUSR2, self.snapshot_memory)
+        except (AttributeError, NotImplementedError):
+            # signals are not available on Windows
+            print("Profiling signal handlers are not supported on this platform")
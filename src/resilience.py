@@ -0,0 +1,102 @@
+"""Helpers to keep calls to a flaky dependency from stalling the pipeline."""
+
+import random
+import time
+from collections import deque
+from enum import StrEnum
+
+
+class CircuitState(StrEnum):
+    """State of a circuit breaker."""
+
+    CLOSED = "closed"  # calls go through
+    OPEN = "open"  # calls are skipped until the cooldown is over
+    HALF_OPEN = "half-open"  # calls go through to probe whether it recovered
+
+
+class CircuitBreaker:
+    """Stops calling a dependency after repeated failures.
+
+    The circuit opens after `failure_threshold` consecutive failures and stays
+    open for `cooldown` seconds, after which calls are let through again. The
+    first failure after that re-opens it, while a success closes it.
+    """
+
+    def __init__(self, *, failure_threshold: int, cooldown: float) -> None:
+        self.failure_threshold: int = failure_threshold
+        self.cooldown: float = cooldown
+        self.state: CircuitState = CircuitState.CLOSED
+        self.failures: int = 0
+        self.opened_at: float = 0.0
+
+    def allow(self) -> bool:
+        """Checks whether a call may be made.
+
+        Returns:
+            bool: False while the circuit is open.
+        """
+        if self.state == CircuitState.OPEN and self.remaining() <= 0:
+            print("Circuit half-open, probing the dependency")
+            self.state = CircuitState.HALF_OPEN
+        return self.state != CircuitState.OPEN
+
+    def remaining(self) -> float:
+        """Seconds until calls are let through again.
+
+        Returns:
+            float: Time left in the cooldown, 0 if the circuit is not open.
+        """
+        if self.state != CircuitState.OPEN:
+            return 0.0
+        return max(0.0, self.opened_at + self.cooldown - time.monotonic())
+
+    def record_success(self) -> None:
+        """Records a successful call, closing the circuit."""
+        if self.state != CircuitState.CLOSED:
+            print("Circuit closed, the dependency recovered")
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        """Records a failed call, opening the circuit if needed."""
+        self.failures += 1
+        if self.state == CircuitState.OPEN:
+            return
+        if self.state == CircuitState.HALF_OPEN or self.failures >= self.failure_threshold:
+            print(f"Circuit open after {self.failures} failures, retrying in {self.cooldown}s")
+            self.state = CircuitState.OPEN
+            self.opened_at = time.monotonic()
+
+
+class LatencyTracker:
+    """Keeps the most recent call latencies to estimate percentiles."""
+
+    def __init__(self, *, size: int = 1000, min_samples: int = 20) -> None:
+        self.latencies: deque[float] = deque(maxlen=size)
+        self.min_samples: int = min_samples
+
+    def record(self, latency: float) -> None:
+        """Records the latency of a call in seconds."""
+        self.latencies.append(latency)
+
+    def percentile(self, percentile: float) -> float | None:
+        """Estimates a latency percentile.
+
+        Returns:
+            float | None: The percentile in seconds, or None if there are not
+                enough samples yet.
+        """
+        if len(self.latencies) < self.min_samples:
+            return None
+        latencies = sorted(self.latencies)
+        return latencies[round((len(latencies) - 1) * percentile / 100)]
+
+
+def backoff_delay(attempt: int, *, base: float, maximum: float) -> float:
+    """Computes an exponential backoff delay with full jitter.
+
+    Returns:
+        float: A random delay between 0 and `base * 2**attempt`, capped at
+            `maximum` seconds.
+    """
+    return random.uniform(0, min(maximum, base * 2**attempt))  # noqa: S311
@@ -0,0 +1,108 @@
+"""Benchmark parsing input files on the event loop against a process pool."""
+
+import argparse
+import asyncio
+import json
+import multiprocessing
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from transfer import LocalTransport, get_postings_from_file, parse_chunk
+
+BUCKET = "benchmark"
+FILEPATH = "job-postings-raw/0.jsonl"
+TICK_INTERVAL = 0.005  # how often the event loop is checked for stalls
+
+
+def generate_file(num_postings: int) -> bytes:
+    """Generates the contents of an input file.
+
+    Returns:
+        bytes: JSONL job postings.
+    """
+    return "".join(
+        json.dumps({
+            "url": f"https://www.example.ai/job/{i}/",
+            "company": f"Company {i % 300}",
+            "title": f"Title {i % 100}",
+            "location": "Boston, MA",
+            "scraped_on": 1_700_000_000 + i,
+        })
+        + "\n"
+        for i in range(num_postings)
+    ).encode()
+
+
+async def measure_stalls(stalls: list[float]) -> None:
+    """Records how late the event loop runs a coroutine that sleeps briefly."""
+    while True:
+        start = time.perf_counter()
+        await asyncio.sleep(TICK_INTERVAL)
+        stalls.append(time.perf_counter() - start - TICK_INTERVAL)
+
+
+async def run(
+    transport: LocalTransport, parse_executor: ProcessPoolExecutor | None
+) -> tuple[int, float, float, float]:
+    """Reads every posting of the input file.
+
+    Returns:
+        tuple[int, float, float, float]: The number of postings, the elapsed
+            time, the CPU time of this process (which includes the event loop
+            but not the workers) and the longest event loop stall, in seconds.
+    """
+    stalls: list[float] = []
+    stall_task = asyncio.create_task(measure_stalls(stalls))
+    await asyncio.sleep(0)
+    count = 0
+    start, start_cpu = time.perf_counter(), time.process_time()
+    async for _ in get_postings_from_file(
+        bucket=BUCKET, filepath=FILEPATH, transport=transport, parse_executor=parse_executor
+    ):
+        count += 1
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - start_cpu
+    # let the stall coroutine record its last, possibly overdue, tick
+    await asyncio.sleep(2 * TICK_INTERVAL)
+    stall_task.cancel()
+    return count, elapsed, cpu, max(stalls, default=0.0)
+
+
+async def benchmark(num_postings: int, workers: int) -> None:
+    """Compares parsing on the event loop with parsing in worker processes."""
+    with tempfile.TemporaryDirectory() as root:
+        transport = LocalTransport(root)
+        await transport.put_object(bucket=BUCKET, key=FILEPATH, body=generate_file(num_postings))
+
+        with ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("forkserver")
+        ) as parse_executor:
+            # start the workers before timing anything
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*[
+                loop.run_in_executor(parse_executor, parse_chunk, b"") for _ in range(workers)
+            ])
+            print(f"{"mode":<12}{"postings":>10}{"elapsed":>10}{"loop cpu":>10}{"max stall":>11}")
+            for mode, executor in (("inline", None), (f"{workers} workers", parse_executor)):
+                count, elapsed, cpu, stall = await run(transport, executor)
+                print(f"{mode:<12}{count:>10}{elapsed:>9.2f}s{cpu:>9.2f}s{stall:>10.3f}s")
+
+
+def main() -> None:
+    """Runs the parsing benchmark."""
+    parser = argparse.ArgumentParser(description="Benchmark parsing of a large input file.")
+    parser.add_argument(
+        "--postings",
+        type=int,
+        default=300_000,
+        help="Number of job postings in the input file (default: 300,000)",
+    )
+    parser.add_argument(
+        "--workers", type=int, default=4, help="Number of parse processes (default: 4)"
+    )
+    args = parser.parse_args()
+    asyncio.run(benchmark(args.postings, args.workers))
+
+
+if __name__ == "__main__":
+    main()
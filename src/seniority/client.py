@@ -1,7 +1,11 @@
 """Client to interact with the gRPC server and run the ingestion pipeline."""
 
 import asyncio
+import multiprocessing
+import time
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import AsyncExitStack
 
 import grpc
 import redis.asyncio as redis
@@ -10,20 +14,65 @@ import seniority_pb2
 import seniority_pb2_grpc
 from config import (
     BUCKET,
+    CANONICALIZE_KEYS,
+    DEDUP_CAPACITY,
+    DEDUP_ENABLED,
+    DEDUP_ERROR_RATE,
+    DEDUP_POLICY,
+    DEDUP_WINDOW,
     DOWNLOAD_PREFIX,
     GRPC_HOST,
     GRPC_PORT,
+    LOCAL_ROOT,
+    PARSE_WORKERS,
+    PROFILE_DIR,
     REDIS_HOST,
     REDIS_PORT,
+    STORAGE_BACKEND,
     UPLOAD_PREFIX,
 )
+from dedup import DedupPolicy, HyperLogLog, PostingDeduplicator
 from jobs import JobPosting, ProcessedJobPosting
-from transfer import stream_new_postings, upload_postings_from_timestamp
+from profiling import TRACER, Profiler
+from resilience import CircuitBreaker, LatencyTracker, backoff_delay
+from transfer import (
+    LocalTransport,
+    Transport,
+    get_default_transport,
+    stream_new_postings,
+    upload_postings_from_timestamp,
+)
 
 CACHE_BATCH_SIZE = 1000
 INFERENCE_BATCH_SIZE = 1000
 LOG_PRINT_INTERVAL = 2000
 
+INFERENCE_TIMEOUT = 10.0  # deadline for each call, in seconds
+INFERENCE_RETRIES = 3
+INFERENCE_BACKOFF_BASE = 0.5
+INFERENCE_BACKOFF_MAX = 10.0
+INFERENCE_HEDGE_PERCENTILE: float | None = None  # e.g. 95 to hedge the slowest 5% of calls
+INFERENCE_MIN_BATCH_SIZE = 1  # rejected batches are split down to this size
+INFERENCE_MAX_ATTEMPTS = 5  # rejections before a posting is reported
+SAVE_UNKNOWN_SENIORITY = False  # save reported postings with UNKNOWN_SENIORITY
+UNKNOWN_SENIORITY = 0
+CIRCUIT_FAILURE_THRESHOLD = 5
+CIRCUIT_COOLDOWN = 30.0
+RETRYABLE_STATUS_CODES = frozenset({
+    grpc.StatusCode.UNAVAILABLE,
+    grpc.StatusCode.DEADLINE_EXCEEDED,
+    grpc.StatusCode.RESOURCE_EXHAUSTED,
+    grpc.StatusCode.ABORTED,
+    grpc.StatusCode.INTERNAL,
+})
+# errors caused by the contents of a batch, any other error means the model
+# cannot serve requests at all
+REJECTED_STATUS_CODES = frozenset({
+    grpc.StatusCode.INVALID_ARGUMENT,
+    grpc.StatusCode.OUT_OF_RANGE,
+    grpc.StatusCode.UNKNOWN,  # the model failed on the input
+})
+
 
 class SeniorityClient:
     """Client to interact with the Seniority gRPC server."""
@@ -35,6 +84,8 @@ class SeniorityClient:
         grpc_channel: grpc.aio.Channel,
         ingestion_queue: asyncio.Queue,
         save_hash_queue: asyncio.Queue,
+        recent_results_size: int = 0,
+        transport: Transport | None = None,
     ) -> None:
         self.redis_client = redis_client
         self.grpc_stub = seniority_pb2_grpc.SeniorityModelStub(grpc_channel)
@@ -42,12 +93,40 @@ class SeniorityClient:
         self.save_hash_queue: asyncio.Queue = save_hash_queue
         self.inference_queue: asyncio.Queue = asyncio.Queue()
         self.save_queue: asyncio.Queue = asyncio.Queue()
+        self.transport: Transport | None = transport
+        # number of processed records to keep around for duplicate postings
+        self.recent_results_size: int = recent_results_size
+        # distinct raw company-title pairs and cache keys seen overall, to
+        # measure how many pairs canonicalization collapses when it is enabled
+        self.raw_pairs = HyperLogLog()
+        self.cache_keys = HyperLogLog()
+        # stop calling the model during an outage, serving cache hits only
+        self.circuit_breaker = CircuitBreaker(
+            failure_threshold=CIRCUIT_FAILURE_THRESHOLD, cooldown=CIRCUIT_COOLDOWN
+        )
+        self.inference_latencies = LatencyTracker()
+        self.retry_tasks: set[asyncio.Task] = set()
+        # number of times the model rejected each posting, by posting hash
+        self.rejected_attempts: dict[int, int] = {}
+        # store processed records organized by file of origin
+        self.pending_files: dict[int, set[ProcessedJobPosting]] = defaultdict(set)
+        # track the hashes for records that have not been processed yet
+        self.missing_hashes_dict: dict[int, set[int]] = defaultdict(set)
+        # most recently processed records, used to fill in duplicate postings
+        # that were not sent through the pipeline again
+        self.recent_postings: dict[int, ProcessedJobPosting] = {}
+        self.upload_tasks: set[asyncio.Task] = set()
 
     async def run_queues(self) -> None:
         """Monitors and processes all queues."""
-        ingestion_task = asyncio.create_task(self.consume_ingestion_queue(CACHE_BATCH_SIZE))
-        inference_task = asyncio.create_task(self.consume_inference_queue(INFERENCE_BATCH_SIZE))
-        save_task = asyncio.create_task(self.consume_save_queue())
+        # named tasks show up as separate tracks when tracing
+        ingestion_task = asyncio.create_task(
+            self.consume_ingestion_queue(CACHE_BATCH_SIZE), name="ingestion"
+        )
+        inference_task = asyncio.create_task(
+            self.consume_inference_queue(INFERENCE_BATCH_SIZE), name="inference"
+        )
+        save_task = asyncio.create_task(self.consume_save_queue(), name="save")
 
         await asyncio.gather(ingestion_task, inference_task, save_task)
 
@@ -64,11 +143,20 @@ class SeniorityClient:
             count += 1
             if count % LOG_PRINT_INTERVAL == 0:
                 print(f"Processed {count} total records")
+                if CANONICALIZE_KEYS:
+                    print(
+                        f"Canonicalization collapsed ~{self.raw_pairs.count()} distinct "
+                        f"company-title pairs into ~{self.cache_keys.count()} cache keys"
+                    )
             cache_key = job_posting.cache_key
             cache_read_dict[cache_key].append(job_posting)
+            if CANONICALIZE_KEYS:
+                self.raw_pairs.add(hash((job_posting.company, job_posting.title)))
+                self.cache_keys.add(int(cache_key[:16], 16))
             if len(cache_read_dict) >= batch_size or self.ingestion_queue.empty():
                 # read cache all at once to reduce the number of calls
-                redis_values = await self.redis_client.mget(cache_read_dict.keys())
+                with TRACER.span("cache_lookup", keys=len(cache_read_dict)):
+                    redis_values = await self.redis_client.mget(cache_read_dict.keys())
                 for key, cached_value in zip(cache_read_dict.keys(), redis_values, strict=True):
                     if cached_value is not None:
                         postings_hit = cache_read_dict[key]
@@ -88,9 +176,11 @@ class SeniorityClient:
         """Consumes the inference_queue and sends data to the gRPC server.
 
         The data is sent in batches of size `batch_size` to the gRPC server for
-        performance and to reduce the number of calls to the server.
+        performance and to reduce the number of calls to the server. Postings
+        that could not be inferred are sent back to the queue later instead of
+        stopping the consumer.
         """
-        inference_dict: dict[str, list[JobPosting]] = defaultdict(list)
+        inference_dict: dict[int, list[JobPosting]] = defaultdict(list)
         cache_write_dict: dict[str, int] = {}
         while True:
             job_posting = await self.inference_queue.get()
@@ -98,81 +188,338 @@ class SeniorityClient:
             if len(inference_dict) >= batch_size or self.inference_queue.empty():
                 grpc_batch = []
                 for postings in inference_dict.values():
+                    # send the canonical values so the model sees the same
+                    # input that the cache is keyed on
                     grpc_request = seniority_pb2.SeniorityRequest(
-                        uuid=postings[0].uuid, company=postings[0].company, title=postings[0].title
+                        uuid=postings[0].uuid,
+                        company=postings[0].canonical_company,
+                        title=postings[0].canonical_title,
                     )
                     grpc_batch.append(grpc_request)
-                grpc_response = await self.grpc_stub.InferSeniority(
-                    seniority_pb2.SeniorityRequestBatch(batch=grpc_batch)
-                )
-                for response in grpc_response.batch:
-                    seniority_level = response.seniority
-                    for posting in inference_dict[response.uuid]:
+                with TRACER.span("inference", requests=len(grpc_batch)):
+                    (
+                        seniority_levels,
+                        unavailable_requests,
+                        rejected_requests,
+                    ) = await self.infer_seniority(grpc_batch)
+                for uuid, seniority_level in seniority_levels.items():
+                    for posting in inference_dict[uuid]:
+                        if self.rejected_attempts:
+                            self.rejected_attempts.pop(hash(posting), None)
                         await self.save_queue.put(
                             ProcessedJobPosting(**posting.model_dump(), seniority=seniority_level)
                         )
                     # use last posting since the cache keys are all the same
                     cache_write_dict[posting.cache_key] = seniority_level
-                # write cache all at once to reduce the number of calls
-                await self.redis_client.mset(cache_write_dict)
+                if unavailable_requests:
+                    # files are only uploaded once complete, so postings must
+                    # be retried rather than dropped while the model is down
+                    self.retry_later([
+                        posting
+                        for request in unavailable_requests
+                        for posting in inference_dict[request.uuid]
+                    ])
+                if rejected_requests:
+                    await self.handle_rejected([
+                        posting
+                        for request in rejected_requests
+                        for posting in inference_dict[request.uuid]
+                    ])
+                if cache_write_dict:
+                    # write cache all at once to reduce the number of calls
+                    with TRACER.span("cache_write", keys=len(cache_write_dict)):
+                        await self.redis_client.mset(cache_write_dict)
                 inference_dict.clear()
                 cache_write_dict.clear()
             self.inference_queue.task_done()
 
+    async def infer_seniority(
+        self, requests: list[seniority_pb2.SeniorityRequest]
+    ) -> tuple[
+        dict[int, int], list[seniority_pb2.SeniorityRequest], list[seniority_pb2.SeniorityRequest]
+    ]:
+        """Infers seniority levels, recovering from failed calls.
+
+        Transient errors are retried and, if they persist or the error is not
+        transient (e.g. `UNAUTHENTICATED`), the whole batch is reported as
+        unavailable, since the model is down, overloaded or misconfigured.
+        Batches rejected because of their contents are split in half and
+        inferred one half at a time, so that a few bad requests do not fail the
+        whole batch. No calls are made while the circuit breaker is open.
+
+        Returns:
+            tuple[dict[int, int], list[seniority_pb2.SeniorityRequest],
+                list[seniority_pb2.SeniorityRequest]]: The seniority level for
+                each UUID, the requests that failed because the model is
+                unavailable, and the requests that the model rejected.
+        """
+        if not self.circuit_breaker.allow():
+            return {}, requests, []
+        try:
+            response_batch = await self.call_with_retries(requests)
+        except grpc.aio.AioRpcError as error:
+            if error.code() not in REJECTED_STATUS_CODES:
+                # splitting would only add load to a struggling model
+                if error.code() not in RETRYABLE_STATUS_CODES:
+                    print(f"Inference call failed with {error.code().name}: {error.details()}")
+                self.circuit_breaker.record_failure()
+                return {}, requests, []
+            if len(requests) <= INFERENCE_MIN_BATCH_SIZE:
+                print(f"Model rejected {len(requests)} requests: {error.code().name}")
+                return {}, [], requests
+            # infer the halves one after the other, so that isolating the bad
+            # requests does not increase the number of concurrent calls
+            middle = len(requests) // 2
+            left, left_unavailable, left_rejected = await self.infer_seniority(requests[:middle])
+            right, right_unavailable, right_rejected = await self.infer_seniority(
+                requests[middle:]
+            )
+            return (
+                left | right,
+                left_unavailable + right_unavailable,
+                left_rejected + right_rejected,
+            )
+
+        self.circuit_breaker.record_success()
+        seniority_levels = {response.uuid: response.seniority for response in response_batch.batch}
+        # treat requests that the server did not answer as rejected
+        rejected = [request for request in requests if request.uuid not in seniority_levels]
+        return seniority_levels, [], rejected
+
+    async def call_with_retries(
+        self, requests: list[seniority_pb2.SeniorityRequest]
+    ) -> seniority_pb2.SeniorityResponseBatch:
+        """Calls the model, retrying transient errors with jittered backoff.
+
+        Returns:
+            seniority_pb2.SeniorityResponseBatch: The model response.
+
+        Raises:
+            grpc.aio.AioRpcError: If the error is not transient, the retries
+                are exhausted or the circuit breaker opened in the meantime.
+        """
+        request_batch = seniority_pb2.SeniorityRequestBatch(batch=requests)
+        attempt = 0
+        while True:
+            try:
+                return await self.hedged_call(request_batch)
+            except grpc.aio.AioRpcError as error:
+                # give up early if other calls have opened the circuit
+                if (
+                    error.code() not in RETRYABLE_STATUS_CODES
+                    or attempt >= INFERENCE_RETRIES
+                    or not self.circuit_breaker.allow()
+                ):
+                    raise
+                delay = backoff_delay(
+                    attempt, base=INFERENCE_BACKOFF_BASE, maximum=INFERENCE_BACKOFF_MAX
+                )
+                print(f"Inference call failed with {error.code().name}, retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def hedged_call(
+        self, request_batch: seniority_pb2.SeniorityRequestBatch
+    ) -> seniority_pb2.SeniorityResponseBatch:
+        """Calls the model, hedging with a second call if the first is slow.
+
+        If `INFERENCE_HEDGE_PERCENTILE` is set, an identical second call is sent
+        once the first one has taken longer than that percentile of recent call
+        latencies, and whichever succeeds first is used.
+
+        Returns:
+            seniority_pb2.SeniorityResponseBatch: The model response.
+        """
+        start = time.monotonic()
+        hedge_delay = (
+            self.inference_latencies.percentile(INFERENCE_HEDGE_PERCENTILE)
+            if INFERENCE_HEDGE_PERCENTILE is not None
+            else None
+        )
+        calls: set[asyncio.Future] = {
+            asyncio.ensure_future(
+                self.grpc_stub.InferSeniority(request_batch, timeout=INFERENCE_TIMEOUT)
+            )
+        }
+        try:
+            if hedge_delay is not None:
+                done, _ = await asyncio.wait(calls, timeout=hedge_delay)
+                if not done:
+                    calls.add(
+                        asyncio.ensure_future(
+                            self.grpc_stub.InferSeniority(request_batch, timeout=INFERENCE_TIMEOUT)
+                        )
+                    )
+            while True:
+                done, calls = await asyncio.wait(calls, return_when=asyncio.FIRST_COMPLETED)
+                for call in done:
+                    if call.exception() is None:
+                        self.inference_latencies.record(time.monotonic() - start)
+                        return call.result()
+                if not calls:
+                    # every call failed, raise the error of the last one
+                    raise done.pop().exception()  # type: ignore[misc]
+        finally:
+            for call in calls:
+                call.cancel()
+
+    async def handle_rejected(self, postings: list[JobPosting]) -> None:
+        """Retries postings rejected by the model.
+
+        Postings rejected `INFERENCE_MAX_ATTEMPTS` times are logged. If
+        `SAVE_UNKNOWN_SENIORITY` is set, they are then saved with
+        `UNKNOWN_SENIORITY` (which is not cached) so that their file can still
+        be uploaded; otherwise they keep being retried, and their file is only
+        uploaded once the model accepts them.
+        """
+        retry_postings: list[JobPosting] = []
+        for posting in postings:
+            posting_hash = hash(posting)
+            attempts = self.rejected_attempts.get(posting_hash, 0) + 1
+            if attempts >= INFERENCE_MAX_ATTEMPTS and SAVE_UNKNOWN_SENIORITY:
+                self.rejected_attempts.pop(posting_hash, None)
+                print(
+                    f"Giving up on inference after {attempts} attempts, saving with unknown "
+                    f"seniority: {posting.model_dump_json()}"
+                )
+                await self.save_queue.put(
+                    ProcessedJobPosting(**posting.model_dump(), seniority=UNKNOWN_SENIORITY)
+                )
+                continue
+            if attempts == INFERENCE_MAX_ATTEMPTS:
+                print(
+                    f"Model rejected a posting {attempts} times, its file will not be uploaded "
+                    f"until it is accepted: {posting.model_dump_json()}"
+                )
+            self.rejected_attempts[posting_hash] = attempts
+            retry_postings.append(posting)
+        if retry_postings:
+            self.retry_later(retry_postings)
+
+    def retry_later(self, postings: list[JobPosting]) -> None:
+        """Sends postings back to the inference_queue after a delay.
+
+        Waits for the circuit breaker cooldown, so that postings are not
+        retried while the model is known to be down.
+        """
+        delay = self.circuit_breaker.remaining() or CIRCUIT_COOLDOWN
+        print(f"Retrying inference for {len(postings)} records in {delay:.0f}s")
+
+        async def requeue() -> None:
+            await asyncio.sleep(delay)
+            for posting in postings:
+                await self.inference_queue.put(posting)
+
+        task = asyncio.create_task(requeue())
+        # create a reference to task to avoid garbage collection
+        self.retry_tasks.add(task)
+        task.add_done_callback(self.retry_tasks.discard)
+
+    def add_to_file(self, filename: int, posting: ProcessedJobPosting) -> None:
+        """Adds a processed record to its file, uploading it once complete."""
+        missing_hashes_set = self.missing_hashes_dict[filename]
+        self.pending_files[filename].add(posting)
+        missing_hashes_set.discard(hash(posting))
+
+        # upload file once all postings are collected
+        if not missing_hashes_set:
+            # offload the upload task to a background thread
+            upload_task = asyncio.create_task(
+                upload_postings_from_timestamp(
+                    bucket=BUCKET,
+                    prefix=UPLOAD_PREFIX,
+                    timestamp=filename,
+                    postings=list(self.pending_files[filename]),
+                    transport=self.transport,
+                ),
+                # unique names keep concurrent uploads on separate tracks
+                name=f"upload-{filename}",
+            )
+            # create a reference to task to avoid garbage collection
+            # see: https://textual.textualize.io/blog/2023/02/11/the-heisenbug-lurking-in-your-async-code/
+            self.upload_tasks.add(upload_task)
+            upload_task.add_done_callback(self.upload_tasks.discard)
+
+    def save_posting(self, posting: ProcessedJobPosting) -> None:
+        """Adds a processed record to every file that is waiting for it."""
+        posting_hash = hash(posting)
+        if self.recent_results_size:
+            self.recent_postings[posting_hash] = posting
+            if len(self.recent_postings) > self.recent_results_size:
+                # dicts keep insertion order, so this is the oldest
+                del self.recent_postings[next(iter(self.recent_postings))]
+
+        for filename, missing_hashes_set in list(self.missing_hashes_dict.items()):
+            if posting_hash in missing_hashes_set:
+                self.add_to_file(filename, posting)
+
+    async def register_file(
+        self, filename: int, hash_list: list[int], duplicates: list[JobPosting]
+    ) -> None:
+        """Starts collecting the records of a file, including its duplicates.
+
+        Duplicate postings are filled in from recent results when possible,
+        otherwise they are either processed again or waited for.
+        """
+        missing_hashes_set = set(hash_list)
+        copied_postings: list[ProcessedJobPosting] = []
+        for duplicate in duplicates:
+            duplicate_hash = hash(duplicate)
+            if duplicate_hash in self.recent_postings:
+                copied_postings.append(self.recent_postings[duplicate_hash])
+            elif duplicate_hash not in missing_hashes_set and not any(
+                duplicate_hash in other_hashes_set
+                for other_hashes_set in self.missing_hashes_dict.values()
+            ):
+                # the earlier result is gone (or the dedup filter gave a false
+                # positive), so process the posting again
+                await self.ingestion_queue.put(duplicate)
+            # otherwise the earlier copy is still being processed and will be
+            # added to this file once it reaches the save_queue
+            missing_hashes_set.add(duplicate_hash)
+        if not missing_hashes_set:
+            # every posting was a dropped duplicate (or the file was empty), so
+            # there is nothing to wait for or upload
+            print(f"Skipping upload of {filename}.jsonl, no records left to save")
+            return
+        self.missing_hashes_dict[filename] = missing_hashes_set
+        for posting in copied_postings:
+            self.add_to_file(filename, posting)
+
     async def consume_save_queue(self) -> None:
         """Consumes the save_queue and uploads files to S3.
 
         Monitor `save_queue` and `save_hash_queue` concurrently, and upload
         files once all records are ready.
         """
-        # store processed records organized by file of origin
-        pending_files: dict[int, set[ProcessedJobPosting]] = defaultdict(set)
-        # track the hashes for records that have not been processed yet
-        missing_hashes_dict: dict[int, set[int]] = defaultdict(set)
 
         # process the save_queue (records ready to be saved)
         async def process_save_queue() -> None:
-            upload_tasks = set()
             process_count = 0
             while True:
-                posting = await self.save_queue.get()
-                process_count += 1
-                if process_count % LOG_PRINT_INTERVAL == 0:
-                    print(f"Processed {process_count} total records")
-                    print("Records still needed for each timestamped file:")
-                    for filename, missing_hashes_set in missing_hashes_dict.items():
-                        print(f"\t{filename}.jsonl: {len(missing_hashes_set)}")
-                posting_hash = hash(posting)
-
-                for filename, missing_hashes_set in missing_hashes_dict.items():
-                    if posting_hash in missing_hashes_set:
-                        pending_files[filename].add(posting)
-                        missing_hashes_set.remove(posting_hash)
-
-                        # upload file once all postings are collected
-                        if not missing_hashes_set:
-                            # offload the upload task to a background thread
-                            upload_task = asyncio.create_task(
-                                upload_postings_from_timestamp(
-                                    bucket=BUCKET,
-                                    prefix=UPLOAD_PREFIX,
-                                    timestamp=filename,
-                                    postings=pending_files[filename],
-                                )
-                            )
-                            # create a reference to task to avoid garbage
-                            # collection
-                            # see: https://textual.textualize.io/blog/2023/02/11/the-heisenbug-lurking-in-your-async-code/
-                            upload_tasks.add(upload_task)
-                            upload_task.add_done_callback(upload_tasks.discard)
+                # take every record that is ready, so that the save stage is
+                # traced per batch rather than per record
+                postings = [await self.save_queue.get()]
+                while not self.save_queue.empty() and len(postings) < CACHE_BATCH_SIZE:
+                    postings.append(self.save_queue.get_nowait())
 
-                self.save_queue.task_done()
+                with TRACER.span("save", postings=len(postings)):
+                    for posting in postings:
+                        process_count += 1
+                        if process_count % LOG_PRINT_INTERVAL == 0:
+                            print(f"Processed {process_count} total records")
+                            print("Records still needed for each timestamped file:")
+                            for filename, missing_hashes_set in self.missing_hashes_dict.items():
+                                print(f"\t{filename}.jsonl: {len(missing_hashes_set)}")
+                        self.save_posting(posting)
+                        self.save_queue.task_done()
 
-        # processing the save_hash_queue (tuples with filenames and hash lists)
+        # processing the save_hash_queue (tuples with filenames, hash lists and
+        # duplicate postings to copy from earlier results)
         async def process_save_hash_queue() -> None:
             while True:
-                filename, hash_list = await self.save_hash_queue.get()
-                missing_hashes_dict[filename] = set(hash_list)
+                filename, hash_list, duplicates = await self.save_hash_queue.get()
+                await self.register_file(filename, hash_list, duplicates)
                 self.save_hash_queue.task_done()
 
         # run both coroutines concurrently
@@ -181,20 +528,60 @@ class SeniorityClient:
 
 async def subscribe() -> None:
     """Subscribe to new job postings and process them."""
+    # toggle profiling and tracing at runtime with SIGUSR1 and SIGUSR2
+    Profiler(PROFILE_DIR).install_signal_handlers()
+
     # create Redis client
     redis_client = redis.Redis(host=REDIS_HOST, port=REDIS_PORT, decode_responses=True)
 
     # create gRPC channel to connect to the gRPC server
-    async with grpc.aio.insecure_channel(f"{GRPC_HOST}:{GRPC_PORT}") as channel:
+    async with (
+        grpc.aio.insecure_channel(f"{GRPC_HOST}:{GRPC_PORT}") as channel,
+        AsyncExitStack() as stack,
+    ):
+        # optionally parse large input files in worker processes
+        parse_executor: ProcessPoolExecutor | None = None
+        if PARSE_WORKERS > 0:
+            # forking a process with running threads (S3 pool, gRPC) can
+            # deadlock the children, so start workers from a clean server
+            parse_executor = ProcessPoolExecutor(
+                max_workers=PARSE_WORKERS, mp_context=multiprocessing.get_context("forkserver")
+            )
+            # wait for the workers to exit without blocking the event loop
+            stack.push_async_callback(asyncio.to_thread, parse_executor.shutdown)
+
         # create two queues to pass data between downloader and client
         ingestion_queue: asyncio.Queue = asyncio.Queue()
         save_hash_queue: asyncio.Queue = asyncio.Queue()
 
+        # read and write files either in S3 or in a local directory
+        transport: Transport
+        if STORAGE_BACKEND == "local":
+            transport = LocalTransport(LOCAL_ROOT)
+        else:
+            transport = get_default_transport()
+
+        # optionally skip postings re-scraped into consecutive files
+        deduplicator: PostingDeduplicator | None = None
+        if DEDUP_ENABLED:
+            deduplicator = PostingDeduplicator(
+                window=DEDUP_WINDOW,
+                capacity=DEDUP_CAPACITY,
+                error_rate=DEDUP_ERROR_RATE,
+                policy=DedupPolicy(DEDUP_POLICY),
+            )
+
         seniority_client = SeniorityClient(
             redis_client=redis_client,
             grpc_channel=channel,
             ingestion_queue=ingestion_queue,
             save_hash_queue=save_hash_queue,
+            transport=transport,
+            recent_results_size=(
+                DEDUP_CAPACITY
+                if deduplicator is not None and deduplicator.policy == DedupPolicy.COPY
+                else 0
+            ),
         )
 
         start_timestamp = 0
@@ -206,7 +593,11 @@ async def subscribe() -> None:
                 bucket=BUCKET,
                 prefix=DOWNLOAD_PREFIX,
                 start_timestamp=start_timestamp,
-            )
+                transport=transport,
+                parse_executor=parse_executor,
+                deduplicator=deduplicator,
+            ),
+            name="downloader",
         )
         client_task = asyncio.create_task(seniority_client.run_queues())
 
@@ -1,7 +1,15 @@
 """Mock gRPC server to infer seniority levels based on company and title."""
 
+import argparse
 import asyncio
+import math
+import multiprocessing
+import random
+import signal
+import statistics
 import time
+from collections import deque
+from types import FrameType
 
 import grpc
 
@@ -9,22 +17,104 @@ import seniority_pb2
 import seniority_pb2_grpc
 from config import GRPC_HOST, GRPC_PORT
 
+TIMEOUT_SLEEP: float = 60  # how long injected timeouts hang before answering
+
 
 class SeniorityModelServicer(seniority_pb2_grpc.SeniorityModelServicer):
-    """gRPC server to infer seniority levels based on company and title."""
+    """gRPC server to infer seniority levels based on company and title.
+
+    Emulates the capacity of the real model: each worker runs `concurrency`
+    batches at a time, each taking `base_latency` plus `service_time` seconds
+    per item. Requests beyond that wait in a queue of at most `queue_depth`
+    requests (further ones are rejected with `RESOURCE_EXHAUSTED`), and while
+    requests are queued the service time grows by `overload_factor` per queued
+    request. Errors and timeouts are injected at the given rates.
+    """
 
-    def InferSeniority(  # noqa: N802
+    def __init__(
+        self,
+        *,
+        service_time: float = 0.001,
+        base_latency: float = 0.0,
+        concurrency: int = 1,
+        queue_depth: int = 100,
+        overload_factor: float = 0.0,
+        error_rate: float = 0.0,
+        timeout_rate: float = 0.0,
+        log_requests: bool = False,
+    ) -> None:
+        self.service_time: float = service_time
+        self.base_latency: float = base_latency
+        self.queue_depth: int = queue_depth
+        self.overload_factor: float = overload_factor
+        self.error_rate: float = error_rate
+        self.timeout_rate: float = timeout_rate
+        self.log_requests: bool = log_requests
+        self.slots = asyncio.Semaphore(concurrency)
+        self.queued: int = 0
+        # stats since the last report
+        self.latencies: deque[float] = deque(maxlen=10_000)
+        self.stats: dict[str, int] = dict.fromkeys(
+            ["requests", "items", "errors", "timeouts", "rejected"], 0
+        )
+
+    async def InferSeniority(  # noqa: N802
         self,
         request: seniority_pb2.SeniorityRequestBatch,
-        context: grpc.aio.ServicerContext,  # noqa: ARG002
+        context: grpc.aio.ServicerContext,
     ) -> seniority_pb2.SeniorityResponseBatch:
         """Infer seniority levels for a batch of company and title pairs.
 
         Returns:
             seniority_pb2.SeniorityResponseBatch: A batch of seniority levels
         """
+        received = time.monotonic()
+        self.stats["requests"] += 1
+        self.stats["items"] += len(request.batch)
+
+        if self.queued >= self.queue_depth:
+            self.stats["rejected"] += 1
+            await context.abort(grpc.StatusCode.RESOURCE_EXHAUSTED, "Model queue is full")
+
+        self.queued += 1
+        waiting = True
+        try:
+            async with self.slots:
+                # the request leaves the queue once a model slot is free
+                self.queued -= 1
+                waiting = False
+                started = time.monotonic()
+                outcome = "ok"
+                if random.random() < self.error_rate:  # noqa: S311
+                    outcome = "error"
+                elif random.random() < self.timeout_rate:  # noqa: S311
+                    outcome = "timeout"
+                    await asyncio.sleep(TIMEOUT_SLEEP)
+                else:
+                    # service time degrades with the number of waiting requests
+                    slowdown = 1 + self.overload_factor * self.queued
+                    await asyncio.sleep(
+                        (self.base_latency + self.service_time * len(request.batch)) * slowdown
+                    )
+        finally:
+            # the client may cancel the request while it is still queued
+            if waiting:
+                self.queued -= 1
+
+        finished = time.monotonic()
+        self.latencies.append(finished - received)
+        if self.log_requests:
+            print(
+                f"{outcome}: {len(request.batch)} items, queued {started - received:.3f}s, "
+                f"served {finished - started:.3f}s, {self.queued} requests waiting"
+            )
+        if outcome == "error":
+            self.stats["errors"] += 1
+            await context.abort(grpc.StatusCode.UNAVAILABLE, "Injected model error")
+        if outcome == "timeout":
+            self.stats["timeouts"] += 1
+
         responses: list[int] = []
-        time.sleep(1)  # simulate max throughput of 1 batch request per second
         for seniority_request in request.batch:
             seniority_level: int = self.mock_seniority_level(
                 seniority_request.company, seniority_request.title
@@ -35,6 +125,24 @@ class SeniorityModelServicer(seniority_pb2_grpc.SeniorityModelServicer):
             responses.append(seniority_response)
         return seniority_pb2.SeniorityResponseBatch(batch=responses)
 
+    async def report_stats(self, interval: float) -> None:
+        """Periodically prints and resets the request statistics."""
+        while True:
+            await asyncio.sleep(interval)
+            if not self.stats["requests"]:
+                continue
+            summary = ", ".join(f"{name}: {value}" for name, value in self.stats.items())
+            summary += f", queued: {self.queued}"
+            if self.latencies:
+                latencies = sorted(self.latencies)
+                p50 = statistics.median(latencies)
+                # nearest rank, so that the slowest 1% is never rounded away
+                p99 = latencies[math.ceil(len(latencies) * 0.99) - 1]
+                summary += f", p50: {p50:.3f}s, p99: {p99:.3f}s"
+            print(f"[{multiprocessing.current_process().name}] {summary}")
+            self.stats = dict.fromkeys(self.stats, 0)
+            self.latencies.clear()
+
     @staticmethod
     def mock_seniority_level(company: str, title: str) -> int:  # noqa: PLR0911
         """Mock seniority level based on company and title.
@@ -58,22 +166,131 @@ class SeniorityModelServicer(seniority_pb2_grpc.SeniorityModelServicer):
         return 5  # otherwise, everyone is the VP of something
 
 
-async def serve() -> None:
+async def serve(args: argparse.Namespace) -> None:
     """Starts the gRPC server to listen for requests asynchronously."""
-    server = grpc.aio.server()
-    seniority_pb2_grpc.add_SeniorityModelServicer_to_server(SeniorityModelServicer(), server)
+    # allow several worker processes to listen on the same port, note that the
+    # kernel assigns each connection to one of them, and a gRPC channel keeps
+    # using the same connection, so every channel is served by a single worker
+    server = grpc.aio.server(options=[("grpc.so_reuseport", 1)])
+    servicer = SeniorityModelServicer(
+        service_time=args.service_time,
+        base_latency=args.base_latency,
+        concurrency=args.concurrency,
+        queue_depth=args.queue_depth,
+        overload_factor=args.overload_factor,
+        error_rate=args.error_rate,
+        timeout_rate=args.timeout_rate,
+        log_requests=args.log_requests,
+    )
+    seniority_pb2_grpc.add_SeniorityModelServicer_to_server(servicer, server)
 
     server.add_insecure_port(f"[::]:{GRPC_PORT}")
     await server.start()
-    print(f"Mock gRPC server is running on {GRPC_HOST}:{GRPC_PORT}")
+    print(
+        f"Mock gRPC server is running on {GRPC_HOST}:{GRPC_PORT} "
+        f"({multiprocessing.current_process().name})"
+    )
+
+    # keep a reference to the task to avoid garbage collection
+    stats_task = asyncio.create_task(servicer.report_stats(args.stats_interval))
 
     # Keep the server running
     await server.wait_for_termination()
+    stats_task.cancel()
+
+
+def run_worker(args: argparse.Namespace) -> None:
+    """Runs a single gRPC server worker."""
+    asyncio.run(serve(args))
 
 
 def main() -> None:
     """Runs the gRPC server."""
-    asyncio.run(serve())
+    parser = argparse.ArgumentParser(description="Run a mock seniority model gRPC server.")
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Number of server processes, each client channel is served by one (default: 1)",
+    )
+    parser.add_argument(
+        "--service-time",
+        type=float,
+        default=0.001,
+        help="Seconds of model time per item in a batch (default: 0.001)",
+    )
+    parser.add_argument(
+        "--base-latency",
+        type=float,
+        default=0.0,
+        help="Fixed seconds of model time per batch (default: 0)",
+    )
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=1,
+        help="Batches each worker processes at the same time (default: 1)",
+    )
+    parser.add_argument(
+        "--queue-depth",
+        type=int,
+        default=100,
+        help="Requests each worker queues before rejecting them (default: 100)",
+    )
+    parser.add_argument(
+        "--overload-factor",
+        type=float,
+        default=0.0,
+        help="Relative service time growth per queued request (default: 0)",
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests that fail with UNAVAILABLE (default: 0)",
+    )
+    parser.add_argument(
+        "--timeout-rate",
+        type=float,
+        default=0.0,
+        help=f"Fraction of requests that hang for {TIMEOUT_SLEEP:.0f}s (default: 0)",
+    )
+    parser.add_argument(
+        "--stats-interval",
+        type=float,
+        default=10.0,
+        help="Seconds between request statistics reports (default: 10)",
+    )
+    parser.add_argument("--log-requests", action="store_true", help="Log every request")
+
+    args = parser.parse_args()
+
+    if args.workers == 1:
+        run_worker(args)
+        return
+
+    workers = [
+        multiprocessing.Process(target=run_worker, args=(args,), name=f"worker-{i}")
+        for i in range(args.workers)
+    ]
+    for worker in workers:
+        worker.start()
+
+    def stop(signum: int, _frame: FrameType | None) -> None:
+        raise SystemExit(128 + signum)
+
+    # stop the workers too when the parent is stopped, instead of leaving them
+    # running with nothing to stop them later
+    signal.signal(signal.SIGTERM, stop)
+    try:
+        for worker in workers:
+            worker.join()
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join()
 
 
 if __name__ == "__main__":